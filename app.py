@@ -8,7 +8,9 @@ if "src" not in sys.path:
     sys.path.append("src")
 
 from ingest import load_all  # type: ignore
+from clean_countries import clean_dataset_path, read_cleaned  # type: ignore
 import preprocess  # type: ignore
+from dedup import STATION_KEY  # type: ignore
 
 st.set_page_config(page_title="Solar Cross-Country Explorer", layout="wide")
 st.title("Solar Data Explorer")
@@ -35,22 +37,16 @@ def try_parse_timestamp(df: pd.DataFrame) -> pd.DataFrame:
 
 @st.cache_data(show_spinner=False)
 def load_local_data() -> pd.DataFrame:
-    # Prefer cleaned CSVs if available; otherwise, load raw and preprocess
+    # Prefer the cleaned Parquet dataset if available; otherwise, load raw and preprocess
     data_dir = "data"
-    cleaned_files = [
-        os.path.join(data_dir, f)
-        for f in ("benin_clean.csv", "sierraleone_clean.csv", "togo_clean.csv")
-    ]
-    if all(os.path.exists(p) for p in cleaned_files):
-        frames = []
-        for p in cleaned_files:
-            c = os.path.basename(p).split("_")[0]
-            d = pd.read_csv(p, parse_dates=["Timestamp"], low_memory=False)
-            d["country"] = c
-            frames.append(d)
-        return pd.concat(frames, ignore_index=True)
+    if os.path.isdir(clean_dataset_path(data_dir)):
+        return read_cleaned(
+            data_dir,
+            countries=["benin", "sierraleone", "togo"],
+            columns=["Timestamp", "GHI", "DNI", "DHI", "Tamb", "RH", "WS"],
+        )
     df = load_all(data_dir)
-    return preprocess.quick_preprocess(df)
+    return preprocess.quick_preprocess(df, dedup_subset=STATION_KEY)
 
 
 def render_single_dashboard(df: pd.DataFrame, label: str) -> None:
@@ -187,4 +183,4 @@ else:
     rank = summary["mean"].sort_values(ascending=False)
     st.bar_chart(rank)
 
-    st.caption("Data loaded locally; CSVs are ignored in git. Upload your own files to compare.")
+    st.caption("Data loaded locally; data/ is ignored in git. Upload your own files to compare.")
@@ -1,29 +1,41 @@
 """
-Simple cleaning utilities and a runner to export per-country cleaned CSVs.
+Simple cleaning utilities and a runner to export per-country cleaned data.
 This script reads local CSVs via ingest.load_all, splits by country, applies
 basic cleaning (z-score outlier filter on selected cols and median impute),
-and writes data/<country>_clean.csv (data/ is gitignored).
+and writes a Parquet dataset under data/clean/ partitioned by country and
+month (data/ is gitignored). data/<country>_clean.csv can still be exported
+with --csv. Use read_cleaned to load it back with column projection and
+country/time filters.
 """
 from __future__ import annotations
 
 import os
+import shutil
 import sys
-from typing import List
+from typing import Iterable, List, Optional
 
 import numpy as np
 import pandas as pd
+import pyarrow.dataset as ds
 
 if "src" not in sys.path:
     sys.path.append("src")
 
 from ingest import load_all  # type: ignore
 import preprocess  # type: ignore
+from dedup import STATION_KEY  # type: ignore
 
 
 ZCOLS = [
     "GHI", "DNI", "DHI", "ModA", "ModB", "WS", "WSgust",
 ]
 
+# cleaned dataset layout: data/clean/country=<c>/period=<YYYY-MM>/*.parquet
+CLEAN_DIR = "clean"
+PARTITION_COLS = ["country", "period"]
+# free-text columns; CSV readers type them as float when a file has no values
+TEXT_COLS = ["Comments"]
+
 
 def zscore_filter(df: pd.DataFrame, cols: List[str], z: float = 3.0) -> pd.DataFrame:
     out = df.copy()
@@ -37,8 +49,8 @@ def zscore_filter(df: pd.DataFrame, cols: List[str], z: float = 3.0) -> pd.DataF
 
 
 def clean_country(df: pd.DataFrame) -> pd.DataFrame:
-    # basic preprocess (datetime + features + numeric fill)
-    df = preprocess.quick_preprocess(df, fill_strategy="median")
+    # basic preprocess (station + Timestamp dedup, datetime + features + numeric fill)
+    df = preprocess.quick_preprocess(df, fill_strategy="median", dedup_subset=STATION_KEY)
     # outlier filter on target/sensors/wind columns
     df = zscore_filter(df, ZCOLS, z=3.0)
     # ensure target present and drop rows with missing target
@@ -47,7 +59,92 @@ def clean_country(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def save_country_csvs(data_dir: str = "data") -> None:
+def clean_dataset_path(data_dir: str = "data") -> str:
+    return os.path.join(data_dir, CLEAN_DIR)
+
+
+def save_country_parquet(df: pd.DataFrame, data_dir: str = "data") -> str:
+    """Write one country's cleaned rows into the partitioned Parquet dataset.
+
+    The country's previous partitions are removed first, so months it no
+    longer has are not read back. Text columns are always written as
+    strings, even when all null, so every partition has the same schema.
+    """
+    out = df.copy()
+    if "Timestamp" in out.columns:
+        out["Timestamp"] = pd.to_datetime(out["Timestamp"], errors="coerce")
+        out["period"] = out["Timestamp"].dt.strftime("%Y-%m").fillna("unknown")
+    else:
+        out["period"] = "unknown"
+    for c in out.columns:
+        if c in PARTITION_COLS:
+            continue
+        if c in TEXT_COLS or not (
+            pd.api.types.is_numeric_dtype(out[c]) or pd.api.types.is_datetime64_any_dtype(out[c])
+        ):
+            out[c] = out[c].astype("string")
+
+    root = clean_dataset_path(data_dir)
+    for country in out["country"].dropna().unique():
+        shutil.rmtree(os.path.join(root, f"country={country}"), ignore_errors=True)
+    out.to_parquet(
+        root,
+        engine="pyarrow",
+        compression="zstd",
+        index=False,
+        partition_cols=PARTITION_COLS,
+        existing_data_behavior="overwrite_or_ignore",
+    )
+    return root
+
+
+def read_cleaned(
+    data_dir: str = "data",
+    *,
+    countries: Optional[Iterable[str]] = None,
+    columns: Optional[Iterable[str]] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+) -> pd.DataFrame:
+    """Load the cleaned Parquet dataset written by save_country_parquet.
+
+    - countries: only read these country partitions
+    - columns: only read these columns ('country' is always included,
+      names missing from the dataset are ignored)
+    - start/end: keep rows with start <= Timestamp < end; whole month
+      partitions outside the range are skipped without being read
+    """
+    root = clean_dataset_path(data_dir)
+    if not os.path.isdir(root):
+        raise FileNotFoundError(f"No cleaned dataset found in {root}. Run src/clean_countries.py first.")
+    dataset = ds.dataset(root, format="parquet", partitioning="hive")
+
+    names = [n for n in dataset.schema.names if n != "period"]
+    if columns is not None:
+        wanted = set(columns) | {"country"}
+        names = [n for n in names if n in wanted]
+
+    expr = None
+    conditions = []
+    if countries is not None:
+        conditions.append(ds.field("country").isin(list(countries)))
+    if start is not None:
+        ts = pd.Timestamp(start)
+        conditions.append(ds.field("period") >= ts.strftime("%Y-%m"))
+        conditions.append(ds.field("Timestamp") >= ts)
+    if end is not None:
+        ts = pd.Timestamp(end)
+        conditions.append(ds.field("period") <= ts.strftime("%Y-%m"))
+        conditions.append(ds.field("Timestamp") < ts)
+    for cond in conditions:
+        expr = cond if expr is None else expr & cond
+
+    df = dataset.to_table(columns=names, filter=expr).to_pandas()
+    df["country"] = df["country"].astype(str)
+    return df
+
+
+def save_countries(data_dir: str = "data", export_csv: bool = False) -> None:
     df_all = load_all(data_dir)
     if "country" not in df_all.columns:
         raise RuntimeError("Expected 'country' column from ingest.load_all")
@@ -57,10 +154,15 @@ def save_country_csvs(data_dir: str = "data") -> None:
     for c in countries:
         sub = df_all[df_all["country"] == c].reset_index(drop=True)
         cleaned = clean_country(sub)
-        out_path = os.path.join(data_dir, f"{c}_clean.csv")
-        cleaned.to_csv(out_path, index=False)
-        print(f"saved -> {out_path} rows={len(cleaned)} cols={len(cleaned.columns)}")
+        for name, n in cleaned.attrs.get("duplicates_removed", {}).items():
+            print(f"duplicates removed: {name} -> {n}")
+        root = save_country_parquet(cleaned, data_dir)
+        print(f"saved -> {root} country={c} rows={len(cleaned)} cols={len(cleaned.columns)}")
+        if export_csv:
+            out_path = os.path.join(data_dir, f"{c}_clean.csv")
+            cleaned.to_csv(out_path, index=False)
+            print(f"saved -> {out_path}")
 
 
 if __name__ == "__main__":
-    save_country_csvs("data")
+    save_countries("data", export_csv="--csv" in sys.argv[1:])
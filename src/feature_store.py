@@ -0,0 +1,216 @@
+"""
+Memory-mapped feature store for the baseline model.
+
+build_feature_store materializes the numeric feature matrix and target once
+as float32 .npy files under data/features/ (data/ is gitignored):
+- X.npy, y.npy: features and target, rows stored as train then test
+- train_idx.npy, test_idx.npy, cv_idx.npy: row positions of each split
+  (the CV sample of a time split is in time order)
+- source_rows.npy: row of the input frame each stored row came from
+- meta.json: feature names, train medians used for imputation, counts
+  and the fingerprint of the inputs the store was built from
+
+load_split opens the arrays with mmap_mode="r". Train and test are contiguous
+row ranges, so they come back as views of the mapped file and joblib
+workers (n_jobs=-1) share the same pages instead of each getting a copy.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+FEATURE_DIR = os.path.join("data", "features")
+SPLITS = ("train", "test", "cv")
+
+
+def fingerprint(paths: Iterable[str], **config) -> Dict:
+    """Size and mtime of each input file plus the build settings.
+
+    Stored in meta.json so callers can tell when the store is stale.
+    Round-tripped through JSON so it compares equal to the stored copy.
+    """
+    files = {}
+    for p in sorted(paths):
+        st = os.stat(p)
+        files[p] = [st.st_size, st.st_mtime_ns]
+    return json.loads(json.dumps({"files": files, "config": config}))
+
+
+def is_stale(fp: Dict, out_dir: str = FEATURE_DIR) -> bool:
+    """True if there is no store in out_dir or it was built from other inputs."""
+    try:
+        return load_meta(out_dir).get("fingerprint") != fp
+    except FileNotFoundError:
+        return True
+
+
+def _column(df: pd.DataFrame, col: str, rows: np.ndarray) -> np.ndarray:
+    return df[col].to_numpy(dtype=np.float32, na_value=np.nan)[rows]
+
+
+def build_feature_store(
+    df: pd.DataFrame,
+    *,
+    target: str = "GHI",
+    out_dir: str = FEATURE_DIR,
+    max_rows: int = 100_000,
+    test_size: float = 0.2,
+    cv_rows: int = 5000,
+    seed: int = 42,
+    time_col: Optional[str] = None,
+    station_col: str = "source_file",
+    embargo: str = "0min",
+    fp: Optional[Dict] = None,
+) -> Dict:
+    """Write the feature matrix, target and split indices to out_dir.
+
+    Rows are downsampled to max_rows and shuffled with seed, then split
+    into train/test: at random, or, if time_col is given, by holding out
+    the last test_size of each station's rows in time. With a time split,
+    train rows within embargo of a station's cutoff are dropped so no
+    train target overlaps the test period. Columns that are all NaN in
+    train are dropped and the remaining NaNs are filled with the train
+    median. The CV split is the first cv_rows train rows (already a random
+    sample after the shuffle). With a time split they are stored in time
+    order for TimeSeriesSplit, and meta["cv_gap"] is the number of CV rows
+    to skip between folds so that they are more than embargo apart.
+    """
+    if target not in df.columns:
+        raise ValueError(f"Target column not found: {target}")
+    df = df.dropna(subset=[target]).reset_index(drop=True)
+
+    num_cols = df.select_dtypes("number").columns.tolist()
+    feature_cols = [c for c in num_cols if c != target]
+
+    rng = np.random.RandomState(seed)
+    rows = rng.permutation(len(df))[:max_rows]
+    if time_col is None:
+        n_test = int(np.ceil(test_size * len(rows)))
+        train_rows, test_rows = rows[n_test:], rows[:n_test]
+    else:
+        t = df[time_col].to_numpy()[rows]
+        codes = pd.factorize(df[station_col])[0][rows]
+        gap = pd.Timedelta(embargo).to_timedelta64()
+        is_train = np.zeros(len(rows), dtype=bool)
+        is_test = np.zeros(len(rows), dtype=bool)
+        for code in np.unique(codes):
+            m = codes == code
+            ts = np.sort(t[m])
+            cutoff = ts[min(int(len(ts) * (1 - test_size)), len(ts) - 1)]
+            is_test[m] = t[m] >= cutoff
+            is_train[m] = t[m] < cutoff - gap
+        train_rows, test_rows = rows[is_train], rows[is_test]
+    n_train, n_test = len(train_rows), len(test_rows)
+    n_embargoed = len(rows) - n_train - n_test
+    cv_idx = np.arange(0, min(cv_rows, n_train))
+    cv_gap = 0
+    if time_col is not None and len(cv_idx):
+        ct = df[time_col].to_numpy()[train_rows[cv_idx]]
+        cv_idx = cv_idx[np.argsort(ct, kind="stable")]
+        ct = np.sort(ct)
+        # m = most CV rows inside any embargo-long window; rows m apart in
+        # time order are then more than embargo apart in time
+        m = (np.searchsorted(ct, ct + gap, side="right") - np.arange(len(ct))).max()
+        cv_gap = int(m) - 1
+    # store train rows first so every split is a contiguous block
+    rows = np.concatenate([train_rows, test_rows])
+
+    # first pass: drop columns that are entirely NaN in train, get medians
+    kept: List[str] = []
+    medians: List[float] = []
+    missing_before_train = 0
+    missing_before_test = 0
+    for c in feature_cols:
+        vals = _column(df, c, rows)
+        nan_mask = np.isnan(vals)
+        if nan_mask[:n_train].all():
+            continue
+        kept.append(c)
+        medians.append(float(np.nanmedian(vals[:n_train])))
+        missing_before_train += int(nan_mask[:n_train].sum())
+        missing_before_test += int(nan_mask[n_train:].sum())
+
+    # build in a sibling dir and swap it in, so a failed build never leaves
+    # new arrays next to an old meta.json
+    tmp_dir = out_dir.rstrip(os.sep) + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+    X = np.lib.format.open_memmap(
+        os.path.join(tmp_dir, "X.npy"), mode="w+", dtype=np.float32, shape=(len(rows), len(kept))
+    )
+    for j, (c, med) in enumerate(zip(kept, medians)):
+        vals = _column(df, c, rows)
+        vals[np.isnan(vals)] = med
+        X[:, j] = vals
+    X.flush()
+    del X
+
+    np.save(os.path.join(tmp_dir, "y.npy"), _column(df, target, rows))
+    np.save(os.path.join(tmp_dir, "source_rows.npy"), rows)
+    np.save(os.path.join(tmp_dir, "train_idx.npy"), np.arange(0, n_train))
+    np.save(os.path.join(tmp_dir, "test_idx.npy"), np.arange(n_train, len(rows)))
+    np.save(os.path.join(tmp_dir, "cv_idx.npy"), cv_idx)
+
+    meta = {
+        "rows_total": int(len(df)),
+        "rows_used": int(len(rows)),
+        "n_train": int(n_train),
+        "n_test": int(n_test),
+        "split": "time" if time_col else "random",
+        "n_embargoed": int(n_embargoed),
+        "cv_gap": cv_gap,
+        "n_features": int(len(kept)),
+        "target": target,
+        "max_rows": int(max_rows),
+        "feature_cols": kept,
+        "medians": medians,
+        "missing_before_train": missing_before_train,
+        "missing_before_test": missing_before_test,
+        "imputer_strategy": "median",
+        "fingerprint": fp,
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+    _replace_dir(tmp_dir, out_dir)
+    return meta
+
+
+def _replace_dir(src: str, dst: str) -> None:
+    old = dst.rstrip(os.sep) + ".old"
+    shutil.rmtree(old, ignore_errors=True)
+    if os.path.isdir(dst):
+        os.rename(dst, old)
+    os.rename(src, dst)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load_meta(out_dir: str = FEATURE_DIR) -> Dict:
+    path = os.path.join(out_dir, "meta.json")
+    if not os.path.isfile(path):
+        raise FileNotFoundError(f"No feature store found in {out_dir}")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def load_split(name: str, out_dir: str = FEATURE_DIR) -> Tuple[np.ndarray, np.ndarray]:
+    """Return (X, y) for a split as read-only memory-mapped arrays.
+
+    Contiguous index ranges are returned as views of the mapped file;
+    anything else falls back to a gathered copy.
+    """
+    if name not in SPLITS:
+        raise ValueError(f"Unknown split: {name}")
+    X = np.load(os.path.join(out_dir, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(out_dir, "y.npy"), mmap_mode="r")
+    idx = np.load(os.path.join(out_dir, f"{name}_idx.npy"))
+    if len(idx) == 0 or (idx[-1] - idx[0] + 1 == len(idx) and (np.diff(idx) == 1).all()):
+        start = int(idx[0]) if len(idx) else 0
+        sl = slice(start, start + len(idx))
+        return X[sl], y[sl]
+    return X[idx], y[idx]
@@ -0,0 +1,159 @@
+"""
+Lag / rolling-window features for short-term forecasting.
+
+add_forecast_features sorts the rows by station and time and, per station,
+adds for each source column:
+- <col>_lag<k>: value k steps back
+- <col>_diff<k>: value now minus value k steps back
+- <col>_mean<w>, <col>_std<w>, <col>_max<w>: over the last w steps
+  (current step included)
+plus the target <target>_h<horizon>: the target value horizon steps ahead.
+
+Features only look at the current and earlier rows of the same station,
+the target only at a later one. A window or lag that would reach into
+another station or before the first row is NaN. Steps are rows, so the
+data should be on a regular grid first (resample.regularize). Rows
+whose feature window or target row is a grid gap (gap_col) get a NaN
+target, so nothing is trained or scored on filled values.
+
+All kernels are O(n) over the whole sorted array: sums via cumulative
+sums, max via the van Herk/Gil-Werman block prefix/suffix maxima.
+"""
+from __future__ import annotations
+
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def _station_starts(codes: np.ndarray) -> np.ndarray:
+    """Index of the first row of each row's station (codes must be sorted)."""
+    n = len(codes)
+    new = np.ones(n, dtype=bool)
+    new[1:] = codes[1:] != codes[:-1]
+    return np.maximum.accumulate(np.where(new, np.arange(n), 0))
+
+
+def _shift(x: np.ndarray, k: int, starts: np.ndarray) -> np.ndarray:
+    """x[i - k] within the station (k > 0 looks back, k < 0 ahead)."""
+    n = len(x)
+    out = np.full(n, np.nan)
+    pos = np.arange(n) - k
+    if k >= 0:
+        ok = pos >= starts
+    else:
+        # the row k steps ahead must still belong to the same station
+        ok = pos < n
+        ok[ok] = starts[pos[ok]] == starts[ok]
+    out[ok] = x[pos[ok]]
+    return out
+
+
+def _window_sum(x: np.ndarray, w: int) -> np.ndarray:
+    """Sum over x[i-w+1..i] (NaN where the window is incomplete or has NaN)."""
+    n = len(x)
+    nan = np.isnan(x)
+    cs = np.concatenate([[0.0], np.cumsum(np.where(nan, 0.0, x))])
+    cn = np.concatenate([[0], np.cumsum(nan)])
+    out = np.full(n, np.nan)
+    if n >= w:
+        s = cs[w:] - cs[:-w]
+        s[(cn[w:] - cn[:-w]) > 0] = np.nan
+        out[w - 1:] = s
+    return out
+
+
+def _window_max(x: np.ndarray, w: int) -> np.ndarray:
+    """Max over x[i-w+1..i] using block prefix/suffix maxima."""
+    n = len(x)
+    out = np.full(n, np.nan)
+    if n < w:
+        return out
+    pad = (-n) % w
+    blocks = np.concatenate([x, np.full(pad, -np.inf)]).reshape(-1, w)
+    prefix = np.maximum.accumulate(blocks, axis=1).ravel()
+    suffix = np.maximum.accumulate(blocks[:, ::-1], axis=1)[:, ::-1].ravel()
+    out[w - 1:] = np.maximum(suffix[: n - w + 1], prefix[w - 1: n])
+    return out
+
+
+def add_forecast_features(
+    df: pd.DataFrame,
+    cols: Iterable[str],
+    *,
+    target: str = "GHI",
+    horizon: int = 15,
+    lags: Iterable[int] = (1, 2, 3, 5, 10),
+    windows: Iterable[int] = (5, 15, 60),
+    diffs: Iterable[int] = (1,),
+    time_col: str = "Timestamp",
+    station_col: str = "source_file",
+    gap_col: Optional[str] = "is_gap",
+) -> Tuple[pd.DataFrame, str]:
+    """Return (frame sorted by station/time with the new columns, target column name)."""
+    if horizon < 1:
+        raise ValueError("horizon must be at least 1 step")
+    cols = list(cols)
+    lags, windows, diffs = list(lags), list(windows), list(diffs)
+    missing = [c for c in cols + [target, time_col, station_col] if c not in df.columns]
+    if missing:
+        raise ValueError(f"Columns not found: {missing}")
+
+    out = df.sort_values([station_col, time_col], kind="stable").reset_index(drop=True)
+    codes = pd.factorize(out[station_col])[0]
+    starts = _station_starts(codes)
+    # length of the window/lag available at each row inside its station
+    span = np.arange(len(out)) - starts + 1
+
+    new: dict = {}
+    for c in cols:
+        x = out[c].to_numpy(dtype=np.float64)
+        for k in lags:
+            new[f"{c}_lag{k}"] = _shift(x, k, starts)
+        for k in diffs:
+            new[f"{c}_diff{k}"] = x - _shift(x, k, starts)
+        # center before squaring to keep the cumulative sums well conditioned
+        mu = float(np.nanmean(x)) if np.isfinite(x).any() else 0.0
+        xc = x - mu
+        for w in windows:
+            s1 = _window_sum(xc, w)
+            s2 = _window_sum(xc * xc, w)
+            mx = _window_max(x, w)
+            short = span < w
+            s1[short] = s2[short] = mx[short] = np.nan
+            mean = s1 / w
+            var = (s2 - s1 * s1 / w) / (w - 1) if w > 1 else np.zeros_like(s1)
+            new[f"{c}_mean{w}"] = mean + mu
+            new[f"{c}_std{w}"] = np.sqrt(np.clip(var, 0.0, None))
+            new[f"{c}_max{w}"] = mx
+
+    target_col = f"{target}_h{horizon}"
+    y = _shift(out[target].to_numpy(dtype=np.float64), -horizon, starts)
+    if gap_col is not None and gap_col in out.columns:
+        gap = out[gap_col].to_numpy(dtype=np.float64)
+        lookback = max(lags + diffs + [w - 1 for w in windows] + [0])
+        # NaN (incomplete window / no row ahead) counts as touching a gap
+        in_window = ~(_window_sum(gap, lookback + 1) == 0)
+        at_target = ~(_shift(gap, -horizon, starts) == 0)
+        y[in_window | at_target] = np.nan
+    new[target_col] = y
+    out = pd.concat([out, pd.DataFrame(new, index=out.index)], axis=1)
+    return out, target_col
+
+
+def feature_names(
+    cols: Iterable[str],
+    *,
+    lags: Iterable[int] = (1, 2, 3, 5, 10),
+    windows: Iterable[int] = (5, 15, 60),
+    diffs: Iterable[int] = (1,),
+) -> List[str]:
+    """Names of the columns add_forecast_features creates (target excluded)."""
+    names: List[str] = []
+    for c in cols:
+        names += [f"{c}_lag{k}" for k in lags]
+        names += [f"{c}_diff{k}" for k in diffs]
+        for w in windows:
+            names += [f"{c}_mean{w}", f"{c}_std{w}", f"{c}_max{w}"]
+    return names
@@ -4,88 +4,116 @@ import sys
 from typing import Dict, Tuple
 
 import numpy as np
-import pandas as pd
 from sklearn.ensemble import RandomForestRegressor
 from sklearn.linear_model import LinearRegression
 from sklearn.metrics import mean_absolute_error, mean_squared_error
-from sklearn.model_selection import train_test_split, KFold, cross_val_score
-from sklearn.impute import SimpleImputer
+from sklearn.model_selection import KFold, TimeSeriesSplit, cross_val_score
 
 
 # allow 'from ingest import load_all' when run as a script
 if "src" not in sys.path:
     sys.path.append("src")
 
-from ingest import load_all  # type: ignore
+from ingest import list_csvs, load_all  # type: ignore
 import preprocess  # type: ignore
-
-
-def prepare_data(target: str = "GHI", max_rows: int = 100_000) -> Tuple[pd.DataFrame, pd.Series, pd.DataFrame, pd.Series, Dict]:
-    df = load_all("data")
-    df = preprocess.quick_preprocess(df)
-
-    if target not in df.columns:
-        raise ValueError(f"Target column not found: {target}")
-
-    df = df.dropna(subset=[target]).reset_index(drop=True)
-
-    # numeric features only, exclude target
-    num_cols = df.select_dtypes("number").columns.tolist()
-    feature_cols = [c for c in num_cols if c != target]
-    X = df[feature_cols]
-    y = df[target]
-
-    # downsample to keep training fast
-    if len(df) > max_rows:
-        idx = np.random.RandomState(42).choice(len(df), size=max_rows, replace=False)
-        X = X.iloc[idx].reset_index(drop=True)
-        y = y.iloc[idx].reset_index(drop=True)
-
-    X_train, X_test, y_train, y_test = train_test_split(
-        X, y, test_size=0.2, random_state=42
+import dedup  # type: ignore
+import feature_store  # type: ignore
+import forecast_features  # type: ignore
+import resample  # type: ignore
+
+
+# columns and windows the lag/rolling features are built from when forecasting
+FORECAST_COLS = ["GHI", "DNI", "DHI"]
+FORECAST_LAGS = (1, 2, 3, 5, 10)
+FORECAST_WINDOWS = (5, 15, 60)
+FORECAST_DIFFS = (1,)
+
+# code that shapes the stored features; editing it invalidates the store
+PIPELINE_MODULES = [preprocess, dedup, resample, forecast_features, feature_store]
+
+
+def prepare_data(
+    target: str = "GHI",
+    max_rows: int = 100_000,
+    store_dir: str = feature_store.FEATURE_DIR,
+    rebuild: bool = False,
+    horizon: int = 0,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, Dict]:
+    # horizon=0 predicts the target at the same timestamp (nowcast);
+    # horizon>0 predicts it that many minutes ahead from lag/rolling features
+    store_target = f"{target}_h{horizon}" if horizon else target
+    # reuse the memory-mapped feature store unless its inputs or settings changed
+    fp = feature_store.fingerprint(
+        list_csvs("data") + [m.__file__ for m in PIPELINE_MODULES],
+        target=target,
+        max_rows=max_rows,
+        horizon=horizon,
+        forecast_cols=FORECAST_COLS,
+        lags=FORECAST_LAGS,
+        windows=FORECAST_WINDOWS,
+        diffs=FORECAST_DIFFS,
     )
-
-    # drop columns that are entirely NaN in train (cannot impute median)
-    all_nan_cols = [c for c in X_train.columns if X_train[c].isna().all()]
-    if all_nan_cols:
-        X_train = X_train.drop(columns=all_nan_cols)
-        X_test = X_test.drop(columns=[c for c in all_nan_cols if c in X_test.columns])
-        feature_cols = [c for c in feature_cols if c not in all_nan_cols]
-
-    # record missing counts before imputation
-    missing_before_train = int(X_train.isna().sum().sum())
-    missing_before_test = int(X_test.isna().sum().sum())
-
-    # simple median imputation for any remaining NaNs
-    imputer = SimpleImputer(strategy="median")
-    X_train = pd.DataFrame(imputer.fit_transform(X_train), columns=X_train.columns)
-    X_test = pd.DataFrame(imputer.transform(X_test), columns=X_test.columns)
-
+    if rebuild or feature_store.is_stale(fp, store_dir):
+        df = load_all("data")
+        if not horizon:
+            df = preprocess.quick_preprocess(df, dedup_subset=dedup.STATION_KEY)
+            feature_store.build_feature_store(
+                df, target=store_target, out_dir=store_dir, max_rows=max_rows, fp=fp
+            )
+        else:
+            # no global fills: anything left missing is imputed from train only
+            df = preprocess.quick_preprocess(df, fill_strategy=None, dedup_subset=dedup.STATION_KEY)
+            lag_cols = [c for c in FORECAST_COLS if c in df.columns]
+            # rows missing a lag input become grid gaps, never filled values
+            df = df.dropna(subset=lag_cols)
+            df, _ = resample.regularize(df, fill=False)
+            windows = dict(lags=FORECAST_LAGS, windows=FORECAST_WINDOWS, diffs=FORECAST_DIFFS)
+            df, store_target = forecast_features.add_forecast_features(
+                df, lag_cols, target=target, horizon=horizon, **windows
+            )
+            # drop warm-up rows and rows whose window or target touches a gap
+            warmup = forecast_features.feature_names(lag_cols, **windows)
+            df = df.dropna(subset=warmup + [store_target]).reset_index(drop=True)
+            # hold out the last 20% of each station in time; the embargo keeps
+            # train targets (t + horizon) out of the test period
+            feature_store.build_feature_store(
+                df, target=store_target, out_dir=store_dir, max_rows=max_rows,
+                time_col="Timestamp", embargo=f"{horizon}min", fp=fp,
+            )
+    store_meta = feature_store.load_meta(store_dir)
+
+    X_train, y_train = feature_store.load_split("train", store_dir)
+    X_test, y_test = feature_store.load_split("test", store_dir)
+
+    feature_cols = store_meta["feature_cols"]
     meta = {
-        "rows_total": int(len(df)),
-        "rows_used": int(len(X)),
-        "n_features": int(len(feature_cols)),
-        "target": target,
+        "rows_total": store_meta["rows_total"],
+        "rows_used": store_meta["rows_used"],
+        "n_features": store_meta["n_features"],
+        "target": store_target,
+        "horizon": horizon,
         "feature_cols_sample": feature_cols[:10],
-        "missing_before_train": missing_before_train,
-        "missing_before_test": missing_before_test,
+        "missing_before_train": store_meta["missing_before_train"],
+        "missing_before_test": store_meta["missing_before_test"],
         "imputer_strategy": "median",
+        "split": store_meta["split"],
     }
     return X_train, X_test, y_train, y_test, meta
 
 
-def evaluate_models(X_train, X_test, y_train, y_test) -> Dict:
+def evaluate_models(X_train, X_test, y_train, y_test, X_cv=None, y_cv=None, cv=None) -> Dict:
     results = {}
-    kfold = KFold(n_splits=3, shuffle=True, random_state=42)
-    # Sample down for cross-validation
+    # shuffled folds by default; forecasts pass a TimeSeriesSplit instead
+    kfold = cv if cv is not None else KFold(n_splits=3, shuffle=True, random_state=42)
+    # Sample down for cross-validation unless a CV split was given
     max_cv_rows = 5000
-    if len(X_train) > max_cv_rows:
-        sample_idx = np.random.RandomState(42).choice(len(X_train), size=max_cv_rows, replace=False)
-        X_cv = X_train.iloc[sample_idx]
-        y_cv = y_train.iloc[sample_idx]
-    else:
+    if X_cv is None or y_cv is None:
         X_cv = X_train
         y_cv = y_train
+        if len(X_train) > max_cv_rows:
+            sample_idx = np.random.RandomState(42).choice(len(X_train), size=max_cv_rows, replace=False)
+            X_cv = X_train[sample_idx]
+            y_cv = y_train[sample_idx]
 
     # Linear Regression
     lr = LinearRegression()
@@ -126,6 +154,7 @@ def evaluate_models(X_train, X_test, y_train, y_test) -> Dict:
     best_model = min(results.items(), key=lambda kv: kv[1]["RMSE"])[0]
     results["best_model"] = best_model
     results["cv_sample_size"] = int(len(X_cv))
+    results["cv_split"] = type(kfold).__name__
     return results
 
 
@@ -138,13 +167,25 @@ def save_metrics(metrics: Dict, meta: Dict, out_dir: str = "metrics", name: str
     return out_path
 
 
-def main() -> None:
-    X_train, X_test, y_train, y_test, meta = prepare_data(target="GHI", max_rows=100_000)
-    results = evaluate_models(X_train, X_test, y_train, y_test)
-    out_path = save_metrics(results, meta)
+def main(horizon: int = 0, store_dir: str = feature_store.FEATURE_DIR) -> None:
+    X_train, X_test, y_train, y_test, meta = prepare_data(
+        target="GHI", max_rows=100_000, store_dir=store_dir, horizon=horizon
+    )
+    X_cv, y_cv = feature_store.load_split("cv", store_dir)
+    cv = None
+    if horizon:
+        # the CV rows are in time order: validate each fold on later rows
+        # only, with cv_gap rows between folds as the embargo
+        cv_gap = feature_store.load_meta(store_dir)["cv_gap"]
+        cv = TimeSeriesSplit(n_splits=3, gap=cv_gap)
+    results = evaluate_models(X_train, X_test, y_train, y_test, X_cv, y_cv, cv=cv)
+    name = f"forecast_h{horizon}.json" if horizon else "baseline.json"
+    out_path = save_metrics(results, meta, name=name)
     print(f"Saved metrics -> {out_path}")
     print(json.dumps({"meta": meta, "metrics": results}, indent=2))
 
 
 if __name__ == "__main__":
-    main()
+    # optional: --horizon N to forecast GHI N minutes ahead
+    args = sys.argv[1:]
+    main(horizon=int(args[args.index("--horizon") + 1]) if "--horizon" in args else 0)
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
+import sys
 from typing import Optional, Iterable
 
 import pandas as pd
 
+if "src" not in sys.path:
+    sys.path.append("src")
+
+from dedup import drop_duplicate_rows, load_hash_index, save_hash_index  # type: ignore
+
 
 DT_CANDIDATES: tuple[str, ...] = (
     "time",
@@ -12,13 +18,36 @@ DT_CANDIDATES: tuple[str, ...] = (
     "timestamp",
 )
 
+# columns created by add_time_features
+TIME_FEATURES: tuple[str, ...] = ("year", "month", "day", "hour", "dayofweek")
 
-def basic_clean(df: pd.DataFrame) -> pd.DataFrame:
-    # strip spaces in column names and drop duplicates.
-    out = df.copy()
-    out.columns = [c.strip() for c in out.columns]
+
+def basic_clean(
+    df: pd.DataFrame,
+    *,
+    subset: Optional[Iterable[str]] = None,
+    hash_index_path: Optional[str] = None,
+) -> pd.DataFrame:
+    """Strip spaces in column names and drop exact duplicate rows.
+
+    Duplicates are matched on subset, or all columns by default;
+    dedup.STATION_KEY dedups on station + Timestamp, and rows with a
+    missing key value (e.g. an unparseable Timestamp) are always kept.
+    Without hash_index_path this is pandas' df.duplicated, no hashing.
+    With it, rows are hashed (see dedup.py): within df, rows sharing a
+    hash are only dropped after their values are compared, rows whose hash
+    is already recorded in the index (built on the same subset) are dropped
+    too, and the index is updated, so incremental batches are only checked
+    against it. Removed rows per source file end up in
+    out.attrs["duplicates_removed"].
+    """
+    out = df.rename(columns=lambda c: c.strip())
     if not out.empty:
-        out = out.drop_duplicates().reset_index(drop=True)
+        index = load_hash_index(hash_index_path, subset) if hash_index_path else None
+        out, index, report = drop_duplicate_rows(out, subset=subset, index=index)
+        if hash_index_path:
+            save_hash_index(hash_index_path, index, subset)
+        out.attrs["duplicates_removed"] = report
     return out
 
 
@@ -101,20 +130,26 @@ def quick_preprocess(
     df: pd.DataFrame,
     *,
     datetime_col: Optional[str] = None,
-    fill_strategy: str = "median",
+    fill_strategy: Optional[str] = "median",
+    dedup_subset: Optional[Iterable[str]] = None,
 ) -> pd.DataFrame:
     """One-pass simple preprocessing for quick experiments.
 
-    - basic_clean
     - find/parse datetime
+    - basic_clean (dedup on dedup_subset, all columns by default)
     - add time features
-    - simple_fill_numeric
+    - simple_fill_numeric (skipped if fill_strategy is None)
     """
-    out = basic_clean(df)
+    out = df.rename(columns=lambda c: c.strip())
     dt_col = datetime_col or find_datetime_column(out)
+    # parse before dedup: datetimes hash much faster than timestamp strings
+    if dt_col:
+        out = parse_datetime(out, dt_col)
+    out = basic_clean(out, subset=dedup_subset)
     if dt_col:
         out = add_time_features(out, dt_col)
-    out = simple_fill_numeric(out, strategy=fill_strategy)
+    if fill_strategy is not None:
+        out = simple_fill_numeric(out, strategy=fill_strategy)
     return out
 
 
@@ -0,0 +1,212 @@
+"""
+Gap-aware regularization and resampling of the minute data, per station.
+
+- find_gaps: missing intervals of a station as run-length rows
+  (start, end, n_missing) instead of one row per missing minute
+- regularize: reindex every station onto a regular grid, then fill NaN
+  runs of the sensor columns up to max_interp steps by time interpolation
+  and longer ones by the station's time-of-day median (climatology)
+- downsample: per-station means at a coarser resolution (5/15/60 min)
+
+A station is one source file (see dedup.STATION_KEY).
+"""
+from __future__ import annotations
+
+import sys
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+if "src" not in sys.path:
+    sys.path.append("src")
+
+import preprocess  # type: ignore
+
+
+RESOLUTIONS: tuple[str, ...] = ("5min", "15min", "60min")
+
+# measured quantities regularize fills by default; flags such as Cleaning
+# stay NaN on filled rows
+SENSOR_COLS: tuple[str, ...] = (
+    "GHI", "DNI", "DHI", "ModA", "ModB", "Tamb", "RH", "WS", "WSgust",
+    "WSstdev", "WD", "WDstdev", "BP", "Precipitation", "TModA", "TModB",
+)
+
+
+def find_gaps(ts: pd.Series, freq: str = "1min") -> pd.DataFrame:
+    """Return the missing intervals of a timestamp series.
+
+    One row per gap: first and last missing timestamp and how many grid
+    steps are missing. Timestamps are sorted and deduplicated first.
+    """
+    step = pd.Timedelta(freq).value
+    t = np.unique(ts.dropna().to_numpy(dtype="datetime64[ns]").astype(np.int64))
+    d = np.diff(t)
+    at = np.flatnonzero(d > step)
+    return pd.DataFrame({
+        "start": pd.to_datetime(t[at] + step),
+        "end": pd.to_datetime(t[at + 1] - step),
+        "n_missing": (d[at] // step - 1).astype(np.int64),
+    })
+
+
+def _nan_runs(mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Length of the NaN run each position belongs to (0 if not NaN), and
+    whether that run touches either end of the array."""
+    n = len(mask)
+    run_len = np.zeros(n, dtype=np.int64)
+    at_edge = np.zeros(n, dtype=bool)
+    if not mask.any():
+        return run_len, at_edge
+    starts = mask & ~np.r_[False, mask[:-1]]
+    run_id = np.cumsum(starts) - 1
+    lengths = np.bincount(run_id[mask])
+    run_len[mask] = lengths[run_id[mask]]
+    edge_runs = []
+    if mask[0]:
+        edge_runs.append(0)
+    if mask[-1]:
+        edge_runs.append(run_id[-1])
+    at_edge[mask] = np.isin(run_id[mask], edge_runs)
+    return run_len, at_edge
+
+
+def _fill_station(
+    g: pd.DataFrame,
+    time_col: str,
+    cols: List[str],
+    freq: str,
+    max_interp: int,
+) -> pd.DataFrame:
+    g = g.drop_duplicates(subset=[time_col]).set_index(time_col).sort_index()
+    grid = pd.date_range(g.index[0], g.index[-1], freq=freq, name=time_col)
+    is_gap = ~grid.isin(g.index)
+    g = g.reindex(grid)
+
+    # work in ns whatever unit the index has (pandas 3 parses to us)
+    t = grid.as_unit("ns").asi8.astype(np.float64)
+    slot = ((grid - grid.normalize()) // pd.Timedelta(freq)).to_numpy()
+    for c in cols:
+        vals = g[c].to_numpy(dtype=np.float64, copy=True)
+        mask = np.isnan(vals)
+        if not mask.any() or mask.all():
+            continue
+        run_len, at_edge = _nan_runs(mask)
+        short = mask & (run_len <= max_interp) & ~at_edge
+        vals[short] = np.interp(t[short], t[~mask], vals[~mask])
+        long_ = mask & ~short
+        if long_.any():
+            clim = pd.Series(vals[~mask]).groupby(slot[~mask]).median()
+            vals[long_] = clim.reindex(slot[long_]).to_numpy()
+        g[c] = vals
+
+    g["is_gap"] = is_gap
+    return g.reset_index()
+
+
+def regularize(
+    df: pd.DataFrame,
+    *,
+    time_col: str = "Timestamp",
+    station_col: str = "source_file",
+    freq: str = "1min",
+    max_interp: int = 15,
+    fill: bool = True,
+    cols: Optional[Iterable[str]] = None,
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """Put every station on a regular time grid and fill the holes.
+
+    Returns (regular frame, gap index). The frame gets an 'is_gap' column
+    for rows that were not in the input. NaN runs in cols (the SENSOR_COLS
+    present by default) of at most max_interp steps are interpolated in
+    time; longer runs and runs at the start/end use the station's median
+    for that time of day. Other numeric columns (flags like Cleaning) are
+    kept but left NaN on new rows. Columns that are constant per station
+    (e.g. country) are carried over, other non-numeric columns are
+    dropped. Time features are recomputed.
+    With fill=False the new rows keep NaN values, e.g. for forecasting,
+    where interpolation and climatology would look into the future.
+    """
+    if df.empty:
+        return df.copy(), pd.DataFrame(columns=[station_col, "start", "end", "n_missing"])
+    out = df.copy()
+    if not pd.api.types.is_datetime64_any_dtype(out[time_col]):
+        out = preprocess.parse_datetime(out, time_col)
+    out = out.dropna(subset=[time_col])
+
+    time_feats = [c for c in preprocess.TIME_FEATURES if c in out.columns]
+    num_cols = [c for c in out.select_dtypes("number").columns if c not in time_feats]
+    const_cols = [
+        c for c in out.columns
+        if c not in num_cols and c not in time_feats and c not in (time_col, station_col)
+        and (out.groupby(station_col)[c].nunique(dropna=False) <= 1).all()
+    ]
+    if cols is None:
+        fill_cols = [c for c in SENSOR_COLS if c in num_cols]
+    else:
+        fill_cols = list(cols)
+        missing = [c for c in fill_cols if c not in num_cols]
+        if missing:
+            raise ValueError(f"Not numeric columns of df: {missing}")
+    keep = [time_col] + num_cols
+
+    frames = []
+    gaps = []
+    for station, g in out.groupby(station_col, sort=True):
+        r = _fill_station(g[keep], time_col, fill_cols if fill else [], freq, max_interp)
+        r[station_col] = station
+        for c in const_cols:
+            r[c] = g[c].iloc[0]
+        frames.append(r)
+        gi = find_gaps(g[time_col], freq)
+        gi.insert(0, station_col, station)
+        gaps.append(gi)
+
+    regular = pd.concat(frames, ignore_index=True)
+    if time_feats:
+        regular = preprocess.add_time_features(regular, time_col)
+    return regular, pd.concat(gaps, ignore_index=True)
+
+
+def downsample(
+    df: pd.DataFrame,
+    rule: str = "15min",
+    *,
+    time_col: str = "Timestamp",
+    station_col: str = "source_file",
+) -> pd.DataFrame:
+    """Average each station's rows into rule-sized bins (see RESOLUTIONS).
+
+    Numeric columns are averaged ('is_gap' becomes the share of filled
+    rows in the bin; unfilled flag columns are NaN only where every row of
+    the bin was filled); per-station constant columns are kept.
+    """
+    time_feats = [c for c in preprocess.TIME_FEATURES if c in df.columns]
+    num_cols = [c for c in df.select_dtypes(["number", "bool"]).columns if c not in time_feats]
+    const_cols = [
+        c for c in df.columns
+        if c not in num_cols and c not in time_feats and c not in (time_col, station_col)
+    ]
+    grouped = df.groupby([station_col, pd.Grouper(key=time_col, freq=rule)], sort=True)
+    out = grouped[num_cols].mean()
+    if const_cols:
+        out = out.join(grouped[const_cols].first())
+    out = out.reset_index()
+    if time_feats:
+        out = preprocess.add_time_features(out, time_col)
+    return out
+
+
+if __name__ == "__main__":
+    # Quick check: regularize the cleaned dataset and show gaps per station
+    try:
+        from clean_countries import read_cleaned  # type: ignore
+
+        data = read_cleaned("data")
+        regular, gap_index = regularize(data)
+        print(gap_index.groupby("source_file")["n_missing"].agg(["count", "sum"]))
+        for rule in RESOLUTIONS:
+            print(f"{rule}: rows={len(downsample(regular, rule))}")
+    except Exception as e:
+        print(f"Resample quick check skipped: {e}")
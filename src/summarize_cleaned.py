@@ -2,25 +2,33 @@ from __future__ import annotations
 
 import json
 import os
+import sys
 from typing import Dict, List
 
 import numpy as np
 import pandas as pd
 from scipy.stats import f_oneway, kruskal
 
+if "src" not in sys.path:
+    sys.path.append("src")
+
+from clean_countries import clean_dataset_path, read_cleaned  # type: ignore
+
+
+# only the columns compute_summary looks at
+SUMMARY_COLS = ["Timestamp", "GHI", "DNI", "DHI", "Cleaning", "ModA", "ModB"]
+
 
 def load_cleaned(data_dir: str = "data") -> Dict[str, pd.DataFrame]:
-    files = {
-        "benin": os.path.join(data_dir, "benin_clean.csv"),
-        "sierraleone": os.path.join(data_dir, "sierraleone_clean.csv"),
-        "togo": os.path.join(data_dir, "togo_clean.csv"),
-    }
+    countries = ["benin", "sierraleone", "togo"]
+    if not os.path.isdir(clean_dataset_path(data_dir)):
+        return {}
+    df = read_cleaned(data_dir, countries=countries, columns=SUMMARY_COLS)
     out = {}
-    for c, p in files.items():
-        if os.path.exists(p):
-            df = pd.read_csv(p, parse_dates=["Timestamp"], low_memory=False)
-            df["country"] = c
-            out[c] = df
+    for c in countries:
+        sub = df[df["country"] == c].reset_index(drop=True)
+        if not sub.empty:
+            out[c] = sub
     return out
 
 
@@ -2,25 +2,25 @@ from __future__ import annotations
 
 import json
 import os
-from typing import Dict, List
+import sys
+from typing import Dict
 
 import numpy as np
 import pandas as pd
 from scipy.stats import f_oneway, kruskal
 
+if "src" not in sys.path:
+    sys.path.append("src")
+
+from clean_countries import read_cleaned  # type: ignore
+
 
 def load_cleaned(data_dir: str = "data") -> pd.DataFrame:
     countries = ["benin", "sierraleone", "togo"]
-    frames: List[pd.DataFrame] = []
-    for c in countries:
-        p = os.path.join(data_dir, f"{c}_clean.csv")
-        if os.path.exists(p):
-            d = pd.read_csv(p, parse_dates=["Timestamp"], low_memory=False)
-            d["country"] = c
-            frames.append(d)
-    if not frames:
-        raise FileNotFoundError("No cleaned CSVs found in data/. Run src/clean_countries.py first.")
-    return pd.concat(frames, ignore_index=True)
+    df = read_cleaned(data_dir, countries=countries, columns=["Timestamp", "GHI", "DNI", "DHI"])
+    if df.empty:
+        raise FileNotFoundError("No cleaned data found in data/clean. Run src/clean_countries.py first.")
+    return df
 
 
 def summarize(df: pd.DataFrame) -> Dict: